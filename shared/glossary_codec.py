@@ -0,0 +1,120 @@
+"""
+Compact wire format for glossary payloads sent between services.
+
+The glossary is encoded column by column: a header with the row count, the ids
+as fixed-width integers, then for each text column a block of byte lengths
+followed by the concatenated UTF-8 values. Large payloads are compressed with
+zstd when available, otherwise gzip.
+
+This module is shared by vocab-service and translation-service. Both images
+are built from the repository root so they copy this single file.
+"""
+import gzip
+import struct
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
+GLOSSARY_MEDIA_TYPE = "application/vnd.glossary.columns"
+MAGIC = b"GLS1"
+TEXT_COLUMNS = ("English", "Spanish")
+
+# Length marker for NULL values in a text column
+NULL_LENGTH = 0xFFFFFFFF
+
+# Payloads smaller than this are sent uncompressed
+COMPRESSION_THRESHOLD = 16 * 1024
+
+def encode_glossary(rows):
+    """Encode (id, English, Spanish) rows into the column-oriented binary format"""
+    count = len(rows)
+    parts = [MAGIC, struct.pack("<I", count), struct.pack(f"<{count}q", *(row[0] for row in rows))]
+
+    for index in range(1, len(TEXT_COLUMNS) + 1):
+        values = [row[index].encode("utf-8") if row[index] is not None else None for row in rows]
+        lengths = [len(value) if value is not None else NULL_LENGTH for value in values]
+        parts.append(struct.pack(f"<{count}I", *lengths))
+        parts.append(b"".join(value for value in values if value))
+
+    return b"".join(parts)
+
+def decode_glossary(payload):
+    """Decode the binary format into a dict of columns"""
+    if payload[:4] != MAGIC:
+        raise ValueError("Not a glossary payload")
+
+    (count,) = struct.unpack_from("<I", payload, 4)
+    offset = 8
+    columns = {"id": list(struct.unpack_from(f"<{count}q", payload, offset))}
+    offset += 8 * count
+
+    for column in TEXT_COLUMNS:
+        lengths = struct.unpack_from(f"<{count}I", payload, offset)
+        offset += 4 * count
+        values = []
+        for length in lengths:
+            if length == NULL_LENGTH:
+                values.append(None)
+                continue
+            values.append(payload[offset:offset + length].decode("utf-8"))
+            offset += length
+        columns[column] = values
+
+    return columns
+
+def accepted_encodings():
+    """Value for the Accept-Encoding header listing the compressions this side can read"""
+    return "zstd, gzip" if ZSTD_AVAILABLE else "gzip"
+
+def _encoding_qualities(accept_encoding):
+    """Parse an Accept-Encoding header into a dict of coding to q-value"""
+    qualities = {}
+    for part in accept_encoding.split(","):
+        name, *params = [piece.strip() for piece in part.split(";")]
+        if not name:
+            continue
+        quality = 1.0
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.lower()] = quality
+    return qualities
+
+def choose_encoding(accept_encoding, size):
+    """Pick a compression for a payload of `size` bytes given the client's Accept-Encoding, or None"""
+    if size < COMPRESSION_THRESHOLD or not accept_encoding:
+        return None
+    qualities = _encoding_qualities(accept_encoding)
+    # Codings listed with q=0, or not listed and not covered by "*", are not acceptable
+    best = None
+    for encoding in (["zstd"] if ZSTD_AVAILABLE else []) + ["gzip"]:
+        quality = qualities.get(encoding, qualities.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[0]):
+            best = (quality, encoding)
+    return best[1] if best else None
+
+def compress(payload, encoding):
+    """Compress a payload with the given Content-Encoding"""
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor().compress(payload)
+    if encoding == "gzip":
+        # The lowest level keeps most of the size win at a fraction of the CPU cost
+        return gzip.compress(payload, compresslevel=1)
+    return payload
+
+def decompress(payload, encoding):
+    """Undo the given Content-Encoding"""
+    if encoding == "zstd":
+        if not ZSTD_AVAILABLE:
+            raise ValueError("zstd payload received but zstandard is not installed")
+        return zstandard.ZstdDecompressor().decompress(payload)
+    if encoding == "gzip":
+        return gzip.decompress(payload)
+    return payload
@@ -3,10 +3,16 @@ from flask_cors import CORS
 import os
 import requests
 import re
+import json
+import hmac
+
+from glossary_codec import GLOSSARY_MEDIA_TYPE, decode_glossary, accepted_encodings, decompress
+from segmenter import split_segments, join_segments, restore_spans, record_segments, get_skip_stats
+from single_flight import translation_flight
 
 # Import the translation model
 try:
-    from translation_model import get_translation_model
+    from translation_model import get_translation_model, use_translation_model, swap_translation_model, get_model_swap_status, SUPPORTED_QUANTIZATIONS, RESERVED_GENERATION_SETTINGS
     from simple_translator import get_simple_translator
     TRANSLATION_MODEL_AVAILABLE = True
 except ImportError:
@@ -20,6 +26,8 @@ CORS(app, resources={r"/*": {"origins": "*", "allow_headers": ["Content-Type", "
 API_KEY_HEADER = 'X-API-Key'
 USER_SERVICE_URL = os.environ.get('USER_SERVICE_URL', 'http://user-service:5001')
 VOCAB_SERVICE_URL = os.environ.get('VOCAB_SERVICE_URL', 'http://vocab-service:5000')
+# Key required for admin operations such as model hot-swaps; admin routes are disabled when unset
+ADMIN_API_KEY = os.environ.get('ADMIN_API_KEY')
 
 @app.after_request
 def add_headers(response):
@@ -66,37 +74,60 @@ def requires_auth(func):
     wrapper.__name__ = func.__name__
     return wrapper
 
+def requires_admin(func):
+    """Wrapper function for routes that need the admin API key"""
+    def wrapper(*args, **kwargs):
+        if not ADMIN_API_KEY:
+            return jsonify({"error": "Admin operations are disabled"}), 403
+        api_key = request.headers.get(API_KEY_HEADER) or ""
+        if not hmac.compare_digest(api_key.encode("utf-8"), ADMIN_API_KEY.encode("utf-8")):
+            return jsonify({"error": "Unauthorized"}), 401
+        return func(*args, **kwargs)
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+def build_vocab_dict(terms, definitions):
+    """Create a dictionary mapping English terms to their definitions"""
+    vocab_dict = {}
+    for term, definition in zip(terms, definitions):
+        # In the vocab service, English is the term (e.g., "SOW") and Spanish is the definition (e.g., "Scope of Work")
+        term = (term or "").strip()
+        definition = (definition or "").strip()
+        if term and definition:
+            vocab_dict[term] = definition
+    return vocab_dict
+
 def fetch_vocabulary(api_key):
-    """Fetch vocabulary terms from the vocab service"""
+    """Fetch vocabulary terms from the vocab service as a term to definition dictionary"""
     try:
-        response = requests.get(
+        # Prefer the compact binary format; older vocab services will still answer with JSON.
+        # The response is streamed, so the with block makes sure the connection goes back to the pool
+        with requests.get(
             f"{VOCAB_SERVICE_URL}/translations",
-            headers={"X-API-Key": api_key}
-        )
-
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"Failed to fetch vocabulary: {response.status_code}")
-            return []
+            headers={
+                "X-API-Key": api_key,
+                "Accept": f"{GLOSSARY_MEDIA_TYPE}, application/json;q=0.9",
+                "Accept-Encoding": accepted_encodings()
+            },
+            stream=True
+        ) as response:
+            if response.status_code == 200:
+                # Read the raw body and decompress it ourselves so gzip and zstd are handled the same way
+                payload = decompress(response.raw.read(decode_content=False), response.headers.get("Content-Encoding"))
+                if response.headers.get("Content-Type", "").startswith(GLOSSARY_MEDIA_TYPE):
+                    columns = decode_glossary(payload)
+                    return build_vocab_dict(columns["English"], columns["Spanish"])
+                rows = json.loads(payload)
+                return build_vocab_dict((row.get("English") for row in rows), (row.get("Spanish") for row in rows))
+            else:
+                print(f"Failed to fetch vocabulary: {response.status_code}")
+                return {}
     except Exception as e:
         print(f"Error fetching vocabulary: {str(e)}")
-        return []
+        return {}
 
-def preprocess_text(text, vocabulary):
+def preprocess_text(text, vocab_dict):
     """Replace vocabulary terms with their definitions in the text"""
-    if not vocabulary:
-        return text
-
-    # Create a dictionary mapping English terms to their definitions
-    vocab_dict = {}
-    for item in vocabulary:
-        # In the vocab service, English is the term (e.g., "SOW") and Spanish is the definition (e.g., "Scope of Work")
-        term = item.get("English", "").strip()
-        definition = item.get("Spanish", "").strip()
-        if term and definition:
-            vocab_dict[term] = definition
-
     if not vocab_dict:
         return text
 
@@ -130,6 +161,36 @@ def preprocess_text(text, vocabulary):
 
     return processed_text
 
+def translate_segments(segments, translate_batch):
+    """Translate the preprocessed prose segments in place and return how many in-request duplicates were collapsed"""
+    prose = [segment for segment in segments if segment["translate"]]
+
+    # Identical segments within the request are translated once and fanned back out
+    unique_inputs = list(dict.fromkeys(segment["model_input"] for segment in prose))
+    translations = dict(zip(unique_inputs, translate_batch(unique_inputs)))
+
+    retry = []
+    for segment in prose:
+        translation = restore_spans(translations[segment["model_input"]], segment["spans"])
+        if translation is None:
+            # The model dropped or mangled a placeholder, so translate the sentence with its spans inline instead
+            retry.append(segment)
+        else:
+            segment["translation"] = translation
+
+    if retry:
+        retry_inputs = list(dict.fromkeys(segment["preprocessed"] for segment in retry))
+        retry_translations = dict(zip(retry_inputs, translate_batch(retry_inputs)))
+        for segment in retry:
+            segment["translation"] = retry_translations[segment["preprocessed"]]
+    return len(prose) - len(unique_inputs)
+
+def shared_translate(model):
+    """Batch translate function that shares in-progress inferences with concurrent identical requests"""
+    def translate_batch(texts):
+        return translation_flight.do_batch([((model.settings_key, text), text) for text in texts], model.translate_batch)
+    return translate_batch
+
 @app.route("/api")
 def hello():
     """Simple API health check endpoint"""
@@ -150,10 +211,21 @@ def translate_text():
     api_key = request.headers.get(API_KEY_HEADER)
 
     # Fetch vocabulary terms
-    vocabulary = fetch_vocabulary(api_key)
-
-    # Preprocess text by replacing terms with their definitions
-    preprocessed_text = preprocess_text(original_text, vocabulary)
+    vocab_dict = fetch_vocabulary(api_key)
+
+    # Split out URLs, emails, code, numbers and Spanish text so only English prose reaches the model
+    segments = split_segments(original_text)
+
+    # Preprocess the prose segments by replacing terms with their definitions, leaving placeholders for protected spans
+    for segment in segments:
+        if segment["translate"]:
+            segment["model_input"] = preprocess_text(segment["source"], vocab_dict)
+            segment["preprocessed"] = restore_spans(segment["model_input"], segment["spans"])
+            if segment["preprocessed"] is None:
+                # A vocabulary term swallowed a placeholder; fall back to preprocessing the sentence as written
+                segment["model_input"] = segment["preprocessed"] = preprocess_text(segment["text"], vocab_dict)
+                segment["spans"] = []
+    preprocessed_text = join_segments(segments, "preprocessed")
 
     # Log the preprocessing results for debugging
     print(f"Original text: {original_text}")
@@ -161,15 +233,23 @@ def translate_text():
 
     # Track if preprocessing made changes
     preprocessing_applied = original_text != preprocessed_text
+    skipped_segments = sum(1 for segment in segments if not segment["translate"] and segment["kind"] != "whitespace")
 
     try:
-        # Get the translation model and translate the preprocessed text
-        model = get_translation_model()
-        translation = model.translate(preprocessed_text)
+        # Get the translation model and translate the preprocessed prose segments
+        with use_translation_model() as model:
+            duplicates = translate_segments(segments, shared_translate(model))
+            count_tokens = model.token_counter()
+        # Only count duplicates once the model step succeeds; the fallback translator saves no inference
+        translation_flight.count_batch_duplicates(duplicates)
+        # Tokens saved by the skip path are counted after the model is handed back, off the inference path
+        record_segments(segments, count_tokens)
+        translation = join_segments(segments, "translation")
 
         response = {
             "translation": translation,
-            "preprocessed": preprocessing_applied
+            "preprocessed": preprocessing_applied,
+            "skipped_segments": skipped_segments
         }
 
         # If preprocessing was applied, include the preprocessed text in the response
@@ -181,11 +261,14 @@ def translate_text():
         # Fallback to simple translator if ML model fails
         try:
             simple_model = get_simple_translator()
-            translation = simple_model.translate(preprocessed_text)
+            translate_segments(segments, lambda texts: [simple_model.translate(text) for text in texts])
+            record_segments(segments)
+            translation = join_segments(segments, "translation")
 
             response = {
                 "translation": translation,
                 "preprocessed": preprocessing_applied,
+                "skipped_segments": skipped_segments,
                 "note": "Used fallback translator"
             }
 
@@ -197,6 +280,67 @@ def translate_text():
         except Exception as simple_e:
             return jsonify({"error": f"Translation failed: {str(e)}, Fallback also failed: {str(simple_e)}"}), 500
 
+@app.route("/metrics", methods=["GET"])
+@requires_auth
+def metrics():
+    """Report how much work the segment skip path and deduplication saved"""
+    return jsonify({"skip_path": get_skip_stats(), "deduplication": translation_flight.get_stats()})
+
+@app.route("/admin/model", methods=["GET"])
+@requires_admin
+def model_status():
+    """Report the active model and the progress of the latest hot-swap"""
+    if not TRANSLATION_MODEL_AVAILABLE:
+        return jsonify({"error": "Translation model is not available"}), 503
+
+    with use_translation_model() as model:
+        active = model.describe()
+        active["memory_bytes"] = model.memory_bytes()
+
+    return jsonify({"active_model": active, "swap": get_model_swap_status()})
+
+@app.route("/admin/model", methods=["POST"])
+@requires_admin
+def swap_model():
+    """Load a new model variant in the background and swap it in once warmed up"""
+    if not TRANSLATION_MODEL_AVAILABLE:
+        return jsonify({"error": "Translation model is not available"}), 503
+
+    data = request.get_json() or {}
+    quantization = data.get("quantization")
+    if quantization not in SUPPORTED_QUANTIZATIONS:
+        return jsonify({"error": f"Unsupported quantization profile: {quantization}"}), 400
+
+    generation_settings = data.get("generation_settings") or {}
+    if not isinstance(generation_settings, dict):
+        return jsonify({"error": "generation_settings must be an object"}), 400
+    reserved = [name for name in generation_settings if name in RESERVED_GENERATION_SETTINGS]
+    if reserved:
+        return jsonify({"error": f"Generation settings not allowed: {', '.join(reserved)}"}), 400
+
+    warmup_texts = data.get("warmup_texts")
+    if warmup_texts is not None and not isinstance(warmup_texts, list):
+        return jsonify({"error": "warmup_texts must be a list"}), 400
+
+    max_length = data.get("max_length")
+    if max_length is not None and (isinstance(max_length, bool) or not isinstance(max_length, int) or max_length <= 0):
+        return jsonify({"error": "max_length must be a positive integer"}), 400
+
+    kwargs = {
+        "quantization": quantization,
+        "generation_settings": generation_settings,
+        "warmup_texts": warmup_texts
+    }
+    if data.get("model_name"):
+        kwargs["model_name"] = data["model_name"]
+    if max_length is not None:
+        kwargs["max_length"] = max_length
+
+    if not swap_translation_model(**kwargs):
+        return jsonify({"error": "A model swap is already in progress", "swap": get_model_swap_status()}), 409
+
+    return jsonify({"message": "Model swap started", "swap": get_model_swap_status()}), 202
+
 if __name__ == "__main__":
     # Initialize translation model if available
     if TRANSLATION_MODEL_AVAILABLE:
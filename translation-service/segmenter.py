@@ -0,0 +1,267 @@
+"""
+Splits input text into segments so that content which needs no translation
+(URLs, emails, code, numbers/IDs and text that is already Spanish) can skip
+the model and be passed through at its original position.
+
+URLs, emails and code inside a sentence are swapped for placeholder tokens so
+the sentence is still translated as a whole; they are put back afterwards.
+"""
+import re
+import threading
+
+# Spans that are never translated. Code is matched first so URLs inside code stay code.
+PROTECTED_PATTERN = re.compile(
+    r'(?P<code>```.*?```|`[^`\n]+`)'
+    r'|(?P<email>[\w.+-]+@[\w-]+(?:\.[\w-]+)+)'
+    r'|(?P<url>(?:https?://|www\.)[^\s<>"\']*[^\s<>"\'.,;:!?)\]])',
+    re.DOTALL
+)
+
+# Stand-ins for protected spans while the rest of the text is split into sentences
+MASK_PATTERN = re.compile(r'\x00(\d+)\x01')
+
+# Tokens that replace protected spans in the text sent to the model
+PLACEHOLDER_PATTERN = re.compile(r'__(\d+)__')
+
+# Candidate sentence boundaries and line breaks; the separators are kept as their own segments
+BOUNDARY_PATTERN = re.compile(r'(?<=[.!?])\s+|\s*\n\s*')
+
+# A period after one of these does not end a sentence
+ABBREVIATIONS = {
+    "mr.", "mrs.", "ms.", "dr.", "prof.", "sr.", "jr.", "st.", "vs.", "etc.", "inc.", "ltd.", "co.",
+    "corp.", "dept.", "approx.", "no.", "fig.", "jan.", "feb.", "mar.", "apr.", "jun.", "jul.",
+    "aug.", "sep.", "sept.", "oct.", "nov.", "dec."
+}
+# Initialisms such as "e.g.", "p.m." and "U.S."
+INITIALISM_PATTERN = re.compile(r'^(?:[A-Za-z]\.)+$')
+
+WORD_PATTERN = re.compile(r"[^\W_]+(?:['\-][^\W_]+)*")
+
+# Common Spanish function words. Ones that are also English words ("un", "son", "con", "es") only count
+# in lowercase, and a sentence containing any ENGLISH_WORDS is never treated as Spanish.
+SPANISH_WORDS = {
+    "el", "la", "los", "las", "de", "del", "al", "que", "y", "en", "un", "una", "unos", "es", "son",
+    "por", "para", "con", "sin", "se", "su", "sus", "lo", "como", "más", "pero", "este", "esta",
+    "estos", "estas", "porque", "entre", "cuando", "muy", "sobre", "también", "hasta", "hay",
+    "donde", "desde", "todo", "todos", "nos", "les", "ni", "otros", "ese", "eso", "esto", "ellos",
+    "ella", "qué", "yo", "otro", "otra", "él", "nada", "mucho", "muchos", "cual", "está", "están",
+    "estoy", "estás", "somos", "tiene", "tengo", "usted", "ustedes", "nosotros", "aquí", "ahora",
+    "cómo", "hola", "gracias"
+}
+ENGLISH_WORDS = {
+    "the", "and", "of", "to", "is", "in", "that", "it", "for", "with", "as", "was", "on", "are",
+    "be", "this", "have", "from", "or", "by", "not", "but", "what", "all", "were", "we", "when",
+    "your", "can", "said", "there", "an", "which", "they", "you", "will", "would", "their", "i",
+    "he", "she", "his", "her", "my", "been", "if", "more", "our", "about", "at", "please", "how"
+}
+# Share of words that must be Spanish function words for a sentence to skip translation
+SPANISH_SHARE = 0.25
+# At least this many function words outside of names, so names and loanwords alone can never skip translation
+MIN_SPANISH_WORDS = 2
+# Only used to break ties for sentences just under SPANISH_SHARE
+SPANISH_MARKS = set("¿¡ñÑáéíóúÁÉÍÓÚ")
+
+# Running totals for the skip path
+skip_stats = {
+    "requests": 0,
+    "segments_total": 0,
+    "segments_translated": 0,
+    "segments_skipped": 0,
+    "tokens_skipped": 0,
+    "skipped_by_kind": {}
+}
+_stats_lock = threading.Lock()
+
+def _segment(text, kind, spans=None):
+    """Build a segment record; only prose is sent to the model"""
+    segment = {"text": text, "kind": kind, "translate": kind == "prose"}
+    if kind == "prose":
+        spans = spans or []
+        segment["text"] = MASK_PATTERN.sub(lambda match: spans[int(match.group(1))], text)
+        if PLACEHOLDER_PATTERN.search(segment["text"]):
+            # The input already looks like our placeholders, so send the spans inline rather than risk mixing them up
+            segment["source"] = segment["text"]
+            segment["spans"] = []
+        else:
+            # Text for the model with protected spans swapped for placeholders
+            segment["source"] = MASK_PATTERN.sub(lambda match: f"__{match.group(1)}__", text)
+            segment["spans"] = spans
+    return segment
+
+def _inside_name(words, index):
+    """Whether the function word at index joins two capitalized words, as in "Calle de la Paz" """
+    left = index - 1
+    while left >= 0 and words[left].lower() in SPANISH_WORDS:
+        left -= 1
+    right = index + 1
+    while right < len(words) and words[right].lower() in SPANISH_WORDS:
+        right += 1
+    return left >= 0 and right < len(words) and words[left][0].isupper() and words[right][0].isupper()
+
+def _count_spanish_words(words):
+    """Count Spanish function words that are not part of an acronym or a proper name"""
+    count = 0
+    for index, word in enumerate(words):
+        lower = word.lower()
+        if lower not in SPANISH_WORDS:
+            continue
+        # Capitalized function words only count at the start of a sentence, so "UN" and "El Niño" don't
+        if word != lower and not (index == 0 and word == lower.capitalize()):
+            continue
+        if word == lower and _inside_name(words, index):
+            continue
+        count += 1
+    return count
+
+def looks_spanish(text):
+    """Heuristic check for text that is already in Spanish, based on its share of Spanish function words"""
+    words = WORD_PATTERN.findall(text)
+    if not words or any(word.lower() in ENGLISH_WORDS for word in words):
+        return False
+
+    spanish_words = _count_spanish_words(words)
+    if spanish_words < MIN_SPANISH_WORDS:
+        return False
+
+    share = spanish_words / len(words)
+    if share >= SPANISH_SHARE:
+        return True
+    # Just under the threshold, accented letters and ¿/¡ decide
+    return share >= SPANISH_SHARE / 2 and any(char in SPANISH_MARKS for char in text)
+
+def _classify_sentence(sentence):
+    """Decide whether a stripped sentence of prose, with protected spans masked out, needs translating"""
+    words = WORD_PATTERN.findall(sentence)
+    if not words:
+        return "punctuation"
+    # Nothing but numbers, IDs and punctuation
+    if all(any(char.isdigit() for char in word) for word in words):
+        return "number"
+    if looks_spanish(sentence):
+        return "spanish"
+    return "prose"
+
+def _is_sentence_end(text, boundary):
+    """Whether a candidate boundary really ends a sentence rather than following an abbreviation"""
+    if "\n" in boundary.group(0):
+        return True
+    before = text[:boundary.start()].split()
+    last_word = before[-1] if before else ""
+    if last_word.lower() in ABBREVIATIONS or INITIALISM_PATTERN.match(last_word):
+        return False
+    # A sentence that continues in lowercase was not really ended
+    following = text[boundary.end():boundary.end() + 1]
+    return not following.islower()
+
+def _split_sentences(text):
+    """Split text into sentences and the whitespace between them"""
+    parts = []
+    position = 0
+    for boundary in BOUNDARY_PATTERN.finditer(text):
+        if not _is_sentence_end(text, boundary):
+            continue
+        parts.append(text[position:boundary.start()])
+        parts.append(boundary.group(0))
+        position = boundary.end()
+    parts.append(text[position:])
+    return [part for part in parts if part]
+
+def _unmask(text, spans):
+    """Put the original protected spans back into masked text"""
+    return MASK_PATTERN.sub(lambda match: spans[int(match.group(1))][0], text)
+
+def _split_sentence(sentence, spans):
+    """Turn one stripped, masked sentence into segments"""
+    kind = _classify_sentence(MASK_PATTERN.sub(" ", sentence))
+    if kind == "prose":
+        # Renumber the spans from zero for this sentence's placeholders
+        local_spans = []
+        def renumber(match):
+            local_spans.append(spans[int(match.group(1))][0])
+            return f"\x00{len(local_spans) - 1}\x01"
+        masked = MASK_PATTERN.sub(renumber, sentence)
+        return [_segment(masked, kind, local_spans)]
+
+    if kind != "punctuation" or not MASK_PATTERN.search(sentence):
+        return [_segment(_unmask(sentence, spans), kind)]
+
+    # Nothing but protected spans and punctuation; pass each piece through with its own kind
+    segments = []
+    position = 0
+    for match in MASK_PATTERN.finditer(sentence):
+        between = sentence[position:match.start()]
+        if between:
+            segments.append(_segment(between, "whitespace" if not between.strip() else "punctuation"))
+        text, span_kind = spans[int(match.group(1))]
+        segments.append(_segment(text, span_kind))
+        position = match.end()
+    if position < len(sentence):
+        rest = sentence[position:]
+        segments.append(_segment(rest, "whitespace" if not rest.strip() else "punctuation"))
+    return segments
+
+def split_segments(text):
+    """Split text into ordered segments; joining their text gives back the original"""
+    # Mask protected spans so sentence splitting never cuts through them
+    spans = []
+    def mask(match):
+        spans.append((match.group(0), match.lastgroup))
+        return f"\x00{len(spans) - 1}\x01"
+    masked = PROTECTED_PATTERN.sub(mask, text)
+
+    segments = []
+    for part in _split_sentences(masked):
+        if not part.strip():
+            segments.append(_segment(part, "whitespace"))
+            continue
+
+        # Keep surrounding whitespace out of the model input so it is preserved exactly
+        stripped = part.strip()
+        leading = part[:len(part) - len(part.lstrip())]
+        trailing = part[len(part.rstrip()):]
+        if leading:
+            segments.append(_segment(leading, "whitespace"))
+        segments.extend(_split_sentence(stripped, spans))
+        if trailing:
+            segments.append(_segment(trailing, "whitespace"))
+    return segments
+
+def restore_spans(text, spans):
+    """Replace placeholders with their spans, or return None if the placeholders did not survive intact"""
+    if not spans:
+        return text
+    found = [int(index) for index in PLACEHOLDER_PATTERN.findall(text)]
+    if sorted(found) != list(range(len(spans))):
+        return None
+    return PLACEHOLDER_PATTERN.sub(lambda match: spans[int(match.group(1))], text)
+
+def join_segments(segments, key="text"):
+    """Reassemble segments in their original order, using `key` for translated ones when present"""
+    return "".join(segment.get(key, segment["text"]) if segment["translate"] else segment["text"] for segment in segments)
+
+def record_segments(segments, count_tokens=None):
+    """Add one request's segments to the skip path stats; skipped tokens are only counted when a counter is given"""
+    skipped_tokens = [
+        count_tokens(segment["text"]) if count_tokens else 0
+        for segment in segments if not segment["translate"] and segment["kind"] != "whitespace"
+    ]
+    with _stats_lock:
+        skip_stats["requests"] += 1
+        for segment in segments:
+            if segment["kind"] == "whitespace":
+                continue
+            skip_stats["segments_total"] += 1
+            if segment["translate"]:
+                skip_stats["segments_translated"] += 1
+            else:
+                skip_stats["segments_skipped"] += 1
+                by_kind = skip_stats["skipped_by_kind"]
+                by_kind[segment["kind"]] = by_kind.get(segment["kind"], 0) + 1
+        skip_stats["tokens_skipped"] += sum(skipped_tokens)
+
+def get_skip_stats():
+    """Return a snapshot of the skip path stats"""
+    with _stats_lock:
+        stats = dict(skip_stats)
+        stats["skipped_by_kind"] = dict(skip_stats["skipped_by_kind"])
+    return stats
@@ -0,0 +1,83 @@
+"""
+Collapses duplicate translation work so identical segments only reach the model once.
+
+Concurrent requests for the same key wait on the call that is already running
+and share its result; duplicates within one request are collapsed by the
+caller and recorded here so both show up in the same counters.
+"""
+import threading
+
+class _Call:
+    """One in-progress call that other requests can wait on"""
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {
+            "calls": 0,
+            "executed": 0,
+            "shared_in_flight": 0,
+            "batch_duplicates": 0
+        }
+
+    def do_batch(self, items, func):
+        """Run func once over the values of unique (key, value) items not already in flight, wait on the rest, and return results in order"""
+        waiting = []
+        leading = []
+        with self._lock:
+            for index, (key, value) in enumerate(items):
+                self.stats["calls"] += 1
+                call = self._calls.get(key)
+                if call is not None:
+                    self.stats["shared_in_flight"] += 1
+                    waiting.append((index, call))
+                else:
+                    call = self._calls[key] = _Call()
+                    self.stats["executed"] += 1
+                    leading.append((index, key, call))
+
+        results = [None] * len(items)
+        if leading:
+            try:
+                outputs = func([items[index][1] for index, _, _ in leading])
+                for (index, _, call), output in zip(leading, outputs):
+                    call.result = results[index] = output
+            except Exception as e:
+                for _, _, call in leading:
+                    call.error = e
+                raise
+            finally:
+                # Later requests start a fresh call rather than reusing a finished one
+                with self._lock:
+                    for _, key, _ in leading:
+                        del self._calls[key]
+                for _, _, call in leading:
+                    call.done.set()
+
+        for index, call in waiting:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            results[index] = call.result
+        return results
+
+    def count_batch_duplicates(self, count):
+        """Record duplicates that were collapsed within a single request"""
+        if count:
+            with self._lock:
+                self.stats["batch_duplicates"] += count
+
+    def get_stats(self):
+        """Return a snapshot of the counters, including the total work collapsed"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats["collapsed"] = stats["shared_in_flight"] + stats["batch_duplicates"]
+        return stats
+
+# Singleton instance shared by all requests
+translation_flight = SingleFlight()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The service modules live next to this directory rather than in an installed package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
@@ -0,0 +1,90 @@
+import pytest
+
+from segmenter import split_segments, join_segments, restore_spans, looks_spanish
+
+def kinds(text):
+    """(kind, text) pairs for the non-whitespace segments of text"""
+    return [(segment["kind"], segment["text"]) for segment in split_segments(text) if segment["kind"] != "whitespace"]
+
+@pytest.mark.parametrize("text", [
+    "Hello team, please review https://example.com/a?b=1. Contact bob@x.org today!",
+    "See:\nhttps://a.com\n```\nx = 1.\ny\n```\nDone. 1234-5678",
+    "  Leading and trailing whitespace.  \n\n",
+    "Dr. Smith will see you at 3 p.m. today. Then leave.",
+    "...",
+])
+def test_join_round_trip(text):
+    assert join_segments(split_segments(text)) == text
+
+def test_inline_spans_become_placeholders():
+    segments = split_segments("Contact john@x.com or see `config.yaml` for details.")
+    assert len(segments) == 1
+    segment = segments[0]
+    assert segment["kind"] == "prose"
+    assert segment["source"] == "Contact __0__ or see __1__ for details."
+    assert segment["spans"] == ["john@x.com", "`config.yaml`"]
+
+def test_url_inside_sentence_keeps_sentence_whole():
+    segments = split_segments("Please visit https://example.com for more details about the project.")
+    assert [segment["source"] for segment in segments] == ["Please visit __0__ for more details about the project."]
+
+def test_standalone_spans_pass_through():
+    assert kinds("See:\nhttps://a.com\nbob@x.org\n`make test`") == [
+        ("prose", "See:"),
+        ("url", "https://a.com"),
+        ("email", "bob@x.org"),
+        ("code", "`make test`"),
+    ]
+
+def test_code_block_is_not_split_into_sentences():
+    assert ("code", "```\nx = 1.\ny\n```") in kinds("Run this:\n```\nx = 1.\ny\n```")
+
+def test_abbreviations_do_not_end_sentences():
+    assert kinds("Dr. Smith will see you at 3 p.m. today. Then leave.") == [
+        ("prose", "Dr. Smith will see you at 3 p.m. today."),
+        ("prose", "Then leave."),
+    ]
+
+def test_numbers_and_punctuation_are_skipped():
+    assert kinds("Order ID: ABC-12345\n1234-5678\n...") == [
+        ("prose", "Order ID: ABC-12345"),
+        ("number", "1234-5678"),
+        ("punctuation", "..."),
+    ]
+
+def test_input_that_looks_like_placeholders_is_sent_inline():
+    segment = split_segments("Use __0__ and https://z.com now.")[0]
+    assert segment["source"] == "Use __0__ and https://z.com now."
+    assert segment["spans"] == []
+
+def test_restore_spans():
+    assert restore_spans("Visite __0__ para __1__.", ["u", "v"]) == "Visite u para v."
+    assert restore_spans("Sin marcadores.", []) == "Sin marcadores."
+
+@pytest.mark.parametrize("translation", ["Visite para detalles.", "Visite __0__ __0__.", "Visite __2__."])
+def test_restore_spans_rejects_lost_or_mangled_placeholders(translation):
+    assert restore_spans(translation, ["https://example.com"]) is None
+
+@pytest.mark.parametrize("text", [
+    "I love piñatas and jalapeños.",
+    "Meet José at the café.",
+    "El Niño hit Perú hard.",
+    "Visit San José del Monte.",
+    "Visit Calle de la Paz del Mar quickly.",
+    "The UN es un organization.",
+    "Send your résumé to Peña by Friday.",
+    "I ordered a jalapeño pizza for the team meeting.",
+])
+def test_english_with_names_and_loanwords_is_translated(text):
+    assert not looks_spanish(text)
+    assert kinds(text) == [("prose", text)]
+
+@pytest.mark.parametrize("text", [
+    "La casa es grande.",
+    "Tiene un perro.",
+    "Hola, ¿cómo estás?",
+    "El informe está listo para el cliente.",
+])
+def test_spanish_is_skipped(text):
+    assert looks_spanish(text)
+    assert kinds(text) == [("spanish", text)]
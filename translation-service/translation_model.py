@@ -1,20 +1,64 @@
 from transformers import AutoTokenizer, AutoModelForSeq2SeqLM
+from contextlib import contextmanager
+import copy
+import gc
+import json
+import threading
+import time
 import torch
 
+DEFAULT_MODEL_NAME = "Helsinki-NLP/opus-mt-en-es"
+DEFAULT_MAX_LENGTH = 128
+
+# Quantization profiles a model can be loaded with (None means full precision)
+SUPPORTED_QUANTIZATIONS = (None, "dynamic-int8")
+
+# Generation settings that are set by the model itself or would change the shape of generate()'s output
+RESERVED_GENERATION_SETTINGS = ("max_length", "num_return_sequences", "return_dict_in_generate")
+
+# Sample sentences used to warm up a freshly loaded model before it takes traffic
+DEFAULT_WARMUP_TEXTS = [
+    "Hello, how are you today?",
+    "Please review the attached document before the meeting.",
+    "The project deadline has been moved to next Friday.",
+]
+
+# Largest number of segments sent to model.generate in one padded batch
+BATCH_SIZE = 16
+
+# How long a swap waits for in-flight requests on the old model before giving up on an explicit release
+DRAIN_TIMEOUT_SECONDS = 60
+
 class TranslationModel:
-    def __init__(self):
-        self.model_name = "Helsinki-NLP/opus-mt-en-es"
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, max_length=DEFAULT_MAX_LENGTH, quantization=None, generation_settings=None):
+        if quantization not in SUPPORTED_QUANTIZATIONS:
+            raise ValueError(f"Unsupported quantization profile: {quantization}")
+        reserved = [name for name in (generation_settings or {}) if name in RESERVED_GENERATION_SETTINGS]
+        if reserved:
+            raise ValueError(f"Generation settings not allowed: {', '.join(reserved)}")
+        self.model_name = model_name
         self.tokenizer = None
         self.model = None
-        self.max_length = 128
+        self.max_length = max_length
+        self.quantization = quantization
+        self.generation_settings = dict(generation_settings or {})
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
+        # Number of requests currently translating with this instance
+        self.in_flight = 0
+        self._in_flight_lock = threading.Lock()
         self.load_model()
+        # Identifies the model variant and generation settings, so identical work can be shared
+        self.settings_key = json.dumps(self.describe(), sort_keys=True)
     
     def load_model(self):
         """Load the translation model and tokenizer"""
         print(f"Loading model {self.model_name} on {self.device}...")
         self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
         self.model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name).to(self.device)
+        if self.quantization == "dynamic-int8":
+            # Dynamic quantization only has CPU kernels, so keep the weights there
+            self.device = "cpu"
+            self.model = torch.quantization.quantize_dynamic(self.model.to("cpu"), {torch.nn.Linear}, dtype=torch.qint8)
         print("Model loaded successfully")
     
     def translate(self, text):
@@ -22,25 +66,194 @@ class TranslationModel:
         if not text:
             return ""
         
-        # Tokenize the input text
-        inputs = self.tokenizer(text, return_tensors="pt", padding=True, truncation=True, max_length=self.max_length)
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
-        
-        # Generate translation
-        with torch.no_grad():
-            output = self.model.generate(**inputs, max_length=self.max_length)
-        
-        # Decode the generated tokens
-        translation = self.tokenizer.batch_decode(output, skip_special_tokens=True)[0]
-        
-        return translation
+        return self.translate_batch([text])[0]
+
+    def translate_batch(self, texts):
+        """Translate a list of English texts to Spanish, generating each chunk as one padded batch"""
+        translations = []
+        for start in range(0, len(texts), BATCH_SIZE):
+            chunk = texts[start:start + BATCH_SIZE]
+
+            # Tokenize the input texts
+            inputs = self.tokenizer(chunk, return_tensors="pt", padding=True, truncation=True, max_length=self.max_length)
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            
+            # Generate translations
+            with torch.no_grad():
+                output = self.model.generate(**inputs, max_length=self.max_length, **self.generation_settings)
+            
+            # Decode the generated tokens
+            decoded = self.tokenizer.batch_decode(output, skip_special_tokens=True)
+            # Results are matched to inputs by position, so anything but one output per input would mix them up
+            if len(decoded) != len(chunk):
+                raise RuntimeError(f"Expected {len(chunk)} translations from the model but got {len(decoded)}")
+            translations.extend(decoded)
+
+        return translations
+
+    def token_counter(self):
+        """Return a function counting tokens with this model's tokenizer that keeps working after a swap releases the model"""
+        tokenizer = self.tokenizer
+        return lambda text: len(tokenizer(text)["input_ids"])
+
+    def describe(self):
+        """Return the settings that identify this model variant"""
+        return {
+            "model_name": self.model_name,
+            "max_length": self.max_length,
+            "quantization": self.quantization,
+            "generation_settings": self.generation_settings,
+            "device": self.device
+        }
+
+    def memory_bytes(self):
+        """Approximate memory held by the model's parameters and buffers"""
+        if self.model is None:
+            return 0
+        total = 0
+        for tensor in list(self.model.parameters()) + list(self.model.buffers()):
+            total += tensor.numel() * tensor.element_size()
+        # Dynamically quantized layers keep their packed weights outside of parameters()
+        for value in self.model.state_dict().values():
+            if isinstance(value, tuple):
+                for item in value:
+                    if isinstance(item, torch.Tensor):
+                        total += item.numel() * item.element_size()
+        return total
+
+    def measure_latency(self, texts):
+        """Translate each sample text and return latency stats in milliseconds"""
+        timings = []
+        for text in texts:
+            start = time.perf_counter()
+            self.translate(text)
+            timings.append((time.perf_counter() - start) * 1000)
+        if not timings:
+            return {"samples": 0}
+        return {
+            "samples": len(timings),
+            "mean_ms": round(sum(timings) / len(timings), 2),
+            "max_ms": round(max(timings), 2)
+        }
+
+    def release(self):
+        """Drop the model weights so their memory can be reclaimed"""
+        self.model = None
+        self.tokenizer = None
+        gc.collect()
+        if torch.cuda.is_available():
+            torch.cuda.empty_cache()
 
 # Singleton instance
 translation_model = None
+# Guards reads and replacement of the singleton so a swap is atomic for new requests
+_model_lock = threading.Lock()
+# Held for the duration of a hot-swap so only one runs at a time
+_swap_lock = threading.Lock()
+# Progress and report of the most recent hot-swap, written by the swap thread and read by requests
+model_swap_status = {"state": "idle"}
+_status_lock = threading.Lock()
 
 def get_translation_model():
     """Get or create the translation model singleton"""
     global translation_model
-    if translation_model is None:
-        translation_model = TranslationModel()
-    return translation_model
+    with _model_lock:
+        if translation_model is None:
+            translation_model = TranslationModel()
+        return translation_model
+
+def _update_swap_status(reset=False, **fields):
+    """Record hot-swap progress, optionally starting from an empty status"""
+    with _status_lock:
+        if reset:
+            model_swap_status.clear()
+        model_swap_status.update(**fields)
+
+def get_model_swap_status():
+    """Return a copy of the hot-swap status that is safe to serialize"""
+    with _status_lock:
+        return copy.deepcopy(model_swap_status)
+
+@contextmanager
+def use_translation_model():
+    """Check out the current model for one request, keeping it alive until the request finishes"""
+    global translation_model
+    # Count the request while holding the singleton lock so a swap can't drain the model in between
+    with _model_lock:
+        if translation_model is None:
+            translation_model = TranslationModel()
+        model = translation_model
+        with model._in_flight_lock:
+            model.in_flight += 1
+    try:
+        yield model
+    finally:
+        with model._in_flight_lock:
+            model.in_flight -= 1
+
+def _model_report(model, warmup_texts):
+    """Collect memory and latency figures for one model variant"""
+    report = model.describe()
+    report["memory_bytes"] = model.memory_bytes()
+    report["latency"] = model.measure_latency(warmup_texts)
+    return report
+
+def _run_model_swap(settings, warmup_texts):
+    """Load, warm up and swap in a new model, then release the old one"""
+    global translation_model
+    try:
+        _update_swap_status(state="loading", error=None)
+        new_model = TranslationModel(**settings)
+
+        _update_swap_status(state="warming")
+        new_report = _model_report(new_model, warmup_texts)
+
+        with _model_lock:
+            old_model = translation_model
+        # Both versions are resident here, so measure the old one on the same samples for comparison
+        old_report = _model_report(old_model, warmup_texts) if old_model is not None else None
+        _update_swap_status(old_model=old_report, new_model=new_report)
+
+        # New requests pick up the new model from here on; in-flight ones keep their reference to the old one
+        with _model_lock:
+            translation_model = new_model
+
+        if old_model is not None:
+            _update_swap_status(state="draining")
+            deadline = time.monotonic() + DRAIN_TIMEOUT_SECONDS
+            while old_model.in_flight > 0 and time.monotonic() < deadline:
+                time.sleep(0.1)
+            if old_model.in_flight == 0:
+                old_model.release()
+            else:
+                # Leave the weights to be garbage collected once the last request lets go
+                print(f"Old model still has {old_model.in_flight} requests in flight, skipping explicit release")
+
+        _update_swap_status(state="complete", finished_at=time.time())
+        print(f"Model hot-swap complete: {new_model.describe()}")
+    except Exception as e:
+        print(f"Model hot-swap failed: {str(e)}")
+        _update_swap_status(state="failed", error=str(e), finished_at=time.time())
+    finally:
+        _swap_lock.release()
+
+def swap_translation_model(model_name=DEFAULT_MODEL_NAME, max_length=DEFAULT_MAX_LENGTH, quantization=None, generation_settings=None, warmup_texts=None):
+    """Start a background hot-swap to a new model variant; returns False if a swap is already running"""
+    if quantization not in SUPPORTED_QUANTIZATIONS:
+        raise ValueError(f"Unsupported quantization profile: {quantization}")
+    if not _swap_lock.acquire(blocking=False):
+        return False
+
+    settings = {
+        "model_name": model_name,
+        "max_length": max_length,
+        "quantization": quantization,
+        "generation_settings": generation_settings
+    }
+    _update_swap_status(reset=True, state="starting", requested=settings, started_at=time.time())
+    threading.Thread(
+        target=_run_model_swap,
+        args=(settings, warmup_texts or DEFAULT_WARMUP_TEXTS),
+        daemon=True
+    ).start()
+    return True
@@ -1,9 +1,11 @@
-from flask import Flask, request, jsonify, g
+from flask import Flask, request, jsonify, g, make_response
 from flask_cors import CORS
 import sqlite3
 import os
 import requests
 
+from glossary_codec import GLOSSARY_MEDIA_TYPE, encode_glossary, choose_encoding, compress
+
 app = Flask(__name__)
 # Enable CORS for all routes with support for credentials and custom headers
 CORS(app, resources={r"/*": {"origins": "*", "allow_headers": ["Content-Type", "X-API-Key"]}}, supports_credentials=True)
@@ -101,8 +103,24 @@ def list_translations():
     cursor = db.cursor()
     cursor.execute("SELECT id, English, Spanish FROM en_es")
     rows = cursor.fetchall()
-    result = [{column: row[i] for i, column in enumerate(["id", "English", "Spanish"])} for row in rows]
-    return jsonify(result)
+
+    # Internal callers can ask for the compact column-oriented format instead of JSON
+    if request.accept_mimetypes.best_match(["application/json", GLOSSARY_MEDIA_TYPE]) == GLOSSARY_MEDIA_TYPE:
+        response = make_response(encode_glossary(rows))
+        response.headers['Content-Type'] = GLOSSARY_MEDIA_TYPE
+    else:
+        result = [{column: row[i] for i, column in enumerate(["id", "English", "Spanish"])} for row in rows]
+        response = jsonify(result)
+
+    # Compress large glossaries when the client supports it
+    payload = response.get_data()
+    encoding = choose_encoding(request.headers.get('Accept-Encoding'), len(payload))
+    if encoding:
+        response.set_data(compress(payload, encoding))
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept')
+    response.vary.add('Accept-Encoding')
+    return response
 
 @app.route("/translations", methods=["POST"])
 @requires_auth
@@ -0,0 +1,77 @@
+"""
+Benchmark the glossary wire formats used between vocab-service and translation-service.
+
+For each glossary size it measures serialize time (including compression),
+payload size, estimated transfer time and parse time (including rebuilding
+the term to definition dictionary, as translation-service does).
+
+Usage: PYTHONPATH=../shared python benchmark_glossary.py [bandwidth in Mbit/s, default 1000]
+"""
+import json
+import sys
+import time
+
+from glossary_codec import ZSTD_AVAILABLE, encode_glossary, decode_glossary, compress, decompress
+
+SIZES = [1000, 10000, 100000]
+REPEATS = 5
+
+def make_rows(count):
+    """Synthetic glossary rows shaped like the en_es table"""
+    return [(i, f"term{i} {'ABC'[i % 3]}", f"definición número {i} del glosario") for i in range(1, count + 1)]
+
+def json_format(rows, encoding):
+    """Current path: jsonify on dict-per-row lists, parsed with json and rebuilt into a dictionary"""
+    def serialize():
+        payload = json.dumps([{"id": row[0], "English": row[1], "Spanish": row[2]} for row in rows]).encode("utf-8")
+        return compress(payload, encoding)
+
+    def parse(payload):
+        items = json.loads(decompress(payload, encoding))
+        return {item["English"]: item["Spanish"] for item in items}
+
+    return serialize, parse
+
+def binary_format(rows, encoding):
+    """Column-oriented binary path"""
+    def serialize():
+        return compress(encode_glossary(rows), encoding)
+
+    def parse(payload):
+        columns = decode_glossary(decompress(payload, encoding))
+        return dict(zip(columns["English"], columns["Spanish"]))
+
+    return serialize, parse
+
+def best_of(func, *args):
+    """Fastest of several runs in milliseconds, along with the last result"""
+    best = None
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = (time.perf_counter() - start) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def main():
+    bandwidth_mbps = float(sys.argv[1]) if len(sys.argv) > 1 else 1000.0
+    encodings = [None, "gzip"] + (["zstd"] if ZSTD_AVAILABLE else [])
+
+    print(f"Transfer estimated at {bandwidth_mbps:g} Mbit/s, best of {REPEATS} runs")
+    print(f"{'terms':>7} {'format':<14} {'bytes':>11} {'serialize ms':>13} {'transfer ms':>12} {'parse ms':>9} {'total ms':>9}")
+
+    for size in SIZES:
+        rows = make_rows(size)
+        for name, build in (("json", json_format), ("binary", binary_format)):
+            for encoding in encodings:
+                serialize, parse = build(rows, encoding)
+                serialize_ms, payload = best_of(serialize)
+                parse_ms, vocab_dict = best_of(parse, payload)
+                assert len(vocab_dict) == size
+                transfer_ms = len(payload) * 8 / (bandwidth_mbps * 1000)
+                label = f"{name}+{encoding}" if encoding else name
+                total_ms = serialize_ms + transfer_ms + parse_ms
+                print(f"{size:>7} {label:<14} {len(payload):>11} {serialize_ms:>13.2f} {transfer_ms:>12.2f} {parse_ms:>9.2f} {total_ms:>9.2f}")
+
+if __name__ == "__main__":
+    main()